@@ -1,7 +1,14 @@
 import spotipy
-from spotipy.oauth2 import SpotifyOAuth
+from spotipy.cache_handler import CacheFileHandler
+from spotipy.oauth2 import SpotifyOAuth, SpotifyOauthError
 from tqdm import tqdm
+import argparse
+import json
 import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from functools import partial
+from multiprocessing import Manager
 from dotenv import load_dotenv
 
 # Load environment variables
@@ -29,8 +36,8 @@ def transfer_followed_artists(source_sp, target_sp):
     target_artist_ids = {artist["id"] for artist in target_artists}
     artists_to_transfer = list(source_artist_ids - target_artist_ids)
 
-    for artist_id in tqdm(artists_to_transfer, desc="Transferring followed artists"):
-        target_sp.user_follow_artists(ids=[artist_id])
+    for i in tqdm(range(0, len(artists_to_transfer), 50), desc="Transferring followed artists"):
+        target_sp.user_follow_artists(ids=artists_to_transfer[i:i + 50])
 
     return len(artists_to_transfer)
 
@@ -57,19 +64,58 @@ def transfer_subscribed_podcasts(source_sp, target_sp):
     target_podcast_ids = {podcast["show"]["id"] for podcast in target_podcasts}
     podcasts_to_transfer = list(source_podcast_ids - target_podcast_ids)
 
-    for podcast_id in tqdm(podcasts_to_transfer, desc="Transferring subscribed podcasts"):
-        target_sp.current_user_saved_shows_add(shows=[podcast_id])
+    for i in tqdm(range(0, len(podcasts_to_transfer), 50), desc="Transferring subscribed podcasts"):
+        target_sp.current_user_saved_shows_add(shows=podcasts_to_transfer[i:i + 50])
 
     return len(podcasts_to_transfer)
 
 def get_liked_tracks_count(sp):
     return sp.current_user_saved_tracks()["total"]
 
-def check_authorizations(client_id, client_secret, client_username, redirect_uri):
+class RateLimitedSpotify(spotipy.Spotify):
+    # Waits on a shared throttle before every API call
+    def __init__(self, throttle, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self._throttle = throttle
+
+    def _internal_call(self, method, url, payload, params):
+        self._throttle()
+        return super()._internal_call(method, url, payload, params)
+
+def wait_for_rate_limit(app_name, requests_per_minute, next_slots, lock):
+    # next_slots/lock are shared across worker processes, so the budget holds per app
+    interval = 60.0 / requests_per_minute
+    with lock:
+        now = time.time()
+        slot = max(now, next_slots.get(app_name, now))
+        next_slots[app_name] = slot + interval
+    if slot > now:
+        time.sleep(slot - now)
+
+class CachedTokenOnlyHandler(CacheFileHandler):
+    # Raises instead of letting spotipy fall back to an interactive OAuth prompt
+    def get_cached_token(self):
+        token_info = super().get_cached_token()
+        if not token_info:
+            raise SpotifyOauthError(f"No cached token in {self.cache_path}, re-run the batch to authorize again.")
+        return token_info
+
+def check_authorizations(client_id, client_secret, client_username, redirect_uri, throttle=None, cache_path=None,
+                         show_dialog=False, interactive=True):
     #redirect_uri = "http://localhost:8080/callback"
-    scope = "playlist-read-private,playlist-modify-private,playlist-modify-public,user-library-read,user-library-modify"
-    auth_manager = SpotifyOAuth(client_id=client_id, client_secret=client_secret, redirect_uri=redirect_uri, scope=scope, username=client_username, cache_path=None)
-    sp = spotipy.Spotify(auth_manager=auth_manager)
+    scope = "playlist-read-private,playlist-modify-private,playlist-modify-public,user-library-read,user-library-modify," + \
+            "user-follow-read,user-follow-modify"
+    if interactive:
+        auth_manager = SpotifyOAuth(client_id=client_id, client_secret=client_secret, redirect_uri=redirect_uri, scope=scope,
+                                    username=client_username, cache_path=cache_path, show_dialog=show_dialog)
+    else:
+        cache_handler = CachedTokenOnlyHandler(cache_path=cache_path, username=client_username)
+        auth_manager = SpotifyOAuth(client_id=client_id, client_secret=client_secret, redirect_uri=redirect_uri, scope=scope,
+                                    cache_handler=cache_handler, open_browser=False)
+    if throttle:
+        sp = RateLimitedSpotify(throttle, auth_manager=auth_manager)
+    else:
+        sp = spotipy.Spotify(auth_manager=auth_manager)
     return sp
 
 def transfer_playlists(source_sp, target_sp, source_user_id, target_user_id):
@@ -133,9 +179,10 @@ def transfer_albums(source_sp, target_sp):
 
     source_album_uris = {album["album"]["uri"] for album in source_albums}
     target_album_uris = {album["album"]["uri"] for album in target_albums}
-    added_albums = len(source_album_uris - target_album_uris)
-    for album_uri in tqdm(source_album_uris - target_album_uris, desc="Transferring albums"):
-        target_sp.current_user_saved_albums_add([album_uri])
+    albums_to_transfer = list(source_album_uris - target_album_uris)
+    added_albums = len(albums_to_transfer)
+    for i in tqdm(range(0, len(albums_to_transfer), 20), desc="Transferring albums"):
+        target_sp.current_user_saved_albums_add(albums_to_transfer[i:i + 20])
     return added_albums
 
 def transfer_liked_tracks(source_sp, target_sp):
@@ -162,11 +209,134 @@ def transfer_liked_tracks(source_sp, target_sp):
     tracks_to_transfer = list(source_track_uris - target_track_uris)
     added_tracks = len(tracks_to_transfer)
 
-    for track_uri in tqdm(tracks_to_transfer, desc="Transferring liked tracks"):
-        target_sp.current_user_saved_tracks_add([track_uri])
+    for i in tqdm(range(0, len(tracks_to_transfer), 50), desc="Transferring liked tracks"):
+        target_sp.current_user_saved_tracks_add(tracks_to_transfer[i:i + 50])
     return added_tracks
 
+RESULT_COLUMNS = ["playlists", "albums", "tracks", "artists", "podcasts"]
+DEFAULT_REQUESTS_PER_MINUTE = 180
+
+def load_manifest(manifest_path):
+    with open(manifest_path, 'r', encoding='utf-8') as file:
+        manifest = json.load(file)
+    apps = manifest.get("apps", {})
+    pairs = manifest.get("pairs", [])
+    if not apps or not pairs:
+        raise ValueError(f"Manifest {manifest_path} must define 'apps' and 'pairs'.")
+    for app_name, app in apps.items():
+        if not all([app.get("client_id"), app.get("client_secret")]):
+            raise ValueError(f"App '{app_name}' is missing client_id or client_secret.")
+        app.setdefault("redirect_uri", "http://localhost:8080/callback")
+        app.setdefault("requests_per_minute", DEFAULT_REQUESTS_PER_MINUTE)
+        requests_per_minute = app["requests_per_minute"]
+        if isinstance(requests_per_minute, bool) or not isinstance(requests_per_minute, (int, float)) \
+                or requests_per_minute <= 0:
+            raise ValueError(f"App '{app_name}' needs a positive requests_per_minute, got {requests_per_minute!r}.")
+    # Workers must not share a token file, refreshes would race on it
+    seen = set()
+    for pair in pairs:
+        for side in ("source", "target"):
+            account = pair.get(side) or {}
+            if account.get("app") not in apps or not account.get("username"):
+                raise ValueError(f"Pair {pair} has an invalid '{side}' account.")
+            key = (account["app"], account["username"])
+            if key in seen:
+                raise ValueError(f"Account '{account['username']}' is listed more than once under app '{account['app']}'.")
+            seen.add(key)
+    return apps, pairs
+
+def authorize_account(app, account, throttle=None, interactive=True):
+    # Tokens are cached per app and user, the same user may be listed under several apps.
+    # show_dialog makes Spotify ask which user to log in as instead of reusing the browser session.
+    cache_path = f".cache-{account['app']}-{account['username']}"
+    return check_authorizations(app["client_id"], app["client_secret"], account["username"],
+                                app["redirect_uri"], throttle=throttle, cache_path=cache_path,
+                                show_dialog=True, interactive=interactive)
+
+def migrate_account_pair(pair, apps, next_slots, lock):
+    # Runs in a worker process, tokens were cached by the parent beforehand
+    source, target = pair["source"], pair["target"]
+    result = {"source": source["username"], "target": target["username"], "error": None}
+    try:
+        sp = {}
+        for side, account in (("source", source), ("target", target)):
+            app = apps[account["app"]]
+            throttle = partial(wait_for_rate_limit, account["app"], app["requests_per_minute"], next_slots, lock)
+            sp[side] = authorize_account(app, account, throttle=throttle, interactive=False)
+        source_user_id = sp["source"].me()["id"]
+        target_user_id = sp["target"].me()["id"]
+
+        result["playlists"] = transfer_playlists(sp["source"], sp["target"], source_user_id, target_user_id)
+        result["albums"] = transfer_albums(sp["source"], sp["target"])
+        result["tracks"] = transfer_liked_tracks(sp["source"], sp["target"])
+        result["artists"] = transfer_followed_artists(sp["source"], sp["target"])
+        result["podcasts"] = transfer_subscribed_podcasts(sp["source"], sp["target"])
+    except Exception as e:
+        result["error"] = str(e)
+    return result
+
+def format_results_table(results):
+    headers = ["source", "target"] + RESULT_COLUMNS + ["status"]
+    rows = []
+    for result in results:
+        row = [result["source"], result["target"]]
+        row += [str(result.get(column, "-")) for column in RESULT_COLUMNS]
+        row.append("error: " + result["error"] if result["error"] else "ok")
+        rows.append(row)
+    totals = ["TOTAL", ""]
+    totals += [str(sum(result.get(column, 0) for result in results)) for column in RESULT_COLUMNS]
+    totals.append(f"{sum(1 for result in results if not result['error'])}/{len(results)} ok")
+    rows.append(totals)
+
+    widths = [max(len(row[i]) for row in [headers] + rows) for i in range(len(headers))]
+    lines = ["  ".join(cell.ljust(width) for cell, width in zip(row, widths)).rstrip() for row in [headers] + rows]
+    lines.insert(1, "  ".join("-" * width for width in widths))
+    return "\n".join(lines)
+
+def run_batch_migration(manifest_path, workers=None):
+    apps, pairs = load_manifest(manifest_path)
+
+    # OAuth prompts can't run inside workers, so authorize every account up front
+    # and check each token belongs to the user it is cached under
+    for pair in pairs:
+        for account in (pair["source"], pair["target"]):
+            user_id = authorize_account(apps[account["app"]], account).me()["id"]
+            if user_id != account["username"]:
+                raise ValueError(f"Token cached for '{account['username']}' (app '{account['app']}') belongs to "
+                                 f"'{user_id}'. Delete .cache-{account['app']}-{account['username']} and log in as the right user.")
+        if pair["source"]["username"] == pair["target"]["username"]:
+            raise ValueError(f"Pair {pair} migrates '{pair['source']['username']}' into itself.")
+
+    # One worker per app by default, each app keeps its own request budget
+    workers = workers or min(len(apps), len(pairs))
+    results = []
+    with Manager() as manager:
+        next_slots = manager.dict()
+        lock = manager.Lock()
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futures = {executor.submit(migrate_account_pair, pair, apps, next_slots, lock): pair for pair in pairs}
+            for future in as_completed(futures):
+                try:
+                    results.append(future.result())
+                except Exception as e:
+                    # Worker died outside migrate_account_pair (e.g. BrokenProcessPool)
+                    pair = futures[future]
+                    results.append({"source": pair["source"]["username"], "target": pair["target"]["username"],
+                                    "error": f"{type(e).__name__}: {e}"})
+    results.sort(key=lambda result: (result["source"], result["target"]))
+    return results
+
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Transfer data between Spotify accounts.")
+    parser.add_argument("--batch", metavar="MANIFEST", help="JSON manifest of account pairs to migrate in parallel")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes for batch mode (default: one per app)")
+    args = parser.parse_args()
+
+    if args.batch:
+        batch_results = run_batch_migration(args.batch, workers=args.workers)
+        print("\n" + format_results_table(batch_results))
+        raise SystemExit(1 if any(result["error"] for result in batch_results) else 0)
+
     # User 1 (Source) - Load from environment
     client_id_1 = os.getenv("SOURCE_CLIENT_ID")
     client_secret_1 = os.getenv("SOURCE_CLIENT_SECRET")
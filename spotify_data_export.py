@@ -1,6 +1,16 @@
+import json
+import os
+import time
+
 import spotipy
 from spotipy.oauth2 import SpotifyOAuth
 
+# Local metadata cache for track/artist lookups
+METADATA_CACHE_FILE = '.spotify_metadata_cache.json'
+METADATA_CACHE_TTL = 30 * 24 * 3600  # Seconds before a cached entry is refetched
+METADATA_CACHE_MAX_ENTRIES = 50000  # Per kind, least recently used entries are dropped
+METADATA_BATCH_SIZE = 50  # Max IDs accepted by /tracks?ids= and /artists?ids=
+
 def write_data_to_file(data, file_path):
     with open(file_path, 'a', encoding='utf-8') as file:  # Change 'w' to 'a'
         for key, value in data.items():
@@ -56,6 +66,8 @@ def get_recently_played_tracks(sp, limit=50):
             'id': track['id'],
             'artist': ', '.join([artist['name'] for artist in track['artists']]),
             'album': track['album']['name'],
+            'artist_ids': [artist['id'] for artist in track['artists']],
+            'duration_ms': track.get('duration_ms'),
             'played_at': played_at
         }
         recently_played_tracks.append(track_info)
@@ -95,21 +107,143 @@ def count_artist_occurrences(sp):
             artist_count[artist_name] = artist_count.get(artist_name, 0) + 1
     return artist_count
 
+def load_metadata_cache(path=METADATA_CACHE_FILE, ttl=METADATA_CACHE_TTL):
+    cache = {'tracks': {}, 'artists': {}}
+    if os.path.exists(path):
+        try:
+            with open(path, 'r', encoding='utf-8') as file:
+                loaded = json.load(file)
+        except (OSError, ValueError):
+            loaded = None  # Corrupt or unreadable cache, start fresh
+        if isinstance(loaded, dict):
+            for kind in ('tracks', 'artists'):
+                if isinstance(loaded.get(kind), dict):
+                    cache[kind] = loaded[kind]
+    # Drop expired or damaged entries so they get refetched
+    now = time.time()
+    for kind in ('tracks', 'artists'):
+        cache[kind] = {key: entry for key, entry in cache[kind].items()
+                       if isinstance(entry, dict) and 'data' in entry
+                       and isinstance(entry.get('fetched_at'), (int, float))
+                       and now - entry['fetched_at'] < ttl}
+        for entry in cache[kind].values():
+            if not isinstance(entry.get('used_at'), (int, float)):
+                entry['used_at'] = entry['fetched_at']
+    return cache
+
+def save_metadata_cache(cache, path=METADATA_CACHE_FILE, max_entries=METADATA_CACHE_MAX_ENTRIES):
+    # Keep only the most recently used entries of each kind
+    for kind in ('tracks', 'artists'):
+        entries = sorted(cache[kind].items(), key=lambda x: x[1].get('used_at', 0), reverse=True)
+        cache[kind] = dict(entries[:max_entries])
+    with open(path, 'w', encoding='utf-8') as file:
+        json.dump(cache, file)
+
+def _slim_track(track):
+    return {
+        'name': track['name'],
+        'duration_ms': track['duration_ms'],
+        'artist_ids': [artist['id'] for artist in track['artists']]
+    }
+
+def _slim_artist(artist):
+    return {
+        'name': artist['name'],
+        'genres': artist['genres'],
+        'popularity': artist['popularity']
+    }
+
+def _store_metadata(cache, kind, key, data):
+    now = time.time()
+    cache[kind][key] = {'data': data, 'fetched_at': now, 'used_at': now}
+
+def cache_track_objects(cache, tracks):
+    # Full track objects already in hand (saved tracks, playlists) cost no extra call
+    for track in tracks:
+        if track and track.get('id') and 'duration_ms' in track:
+            _store_metadata(cache, 'tracks', track['id'], _slim_track(track))
+
+def get_cached_metadata(sp, cache, kind, ids, batch_size=METADATA_BATCH_SIZE):
+    # kind is 'tracks' or 'artists', missing IDs are resolved through the batch endpoints
+    fetch = {'tracks': sp.tracks, 'artists': sp.artists}[kind]
+    slim = {'tracks': _slim_track, 'artists': _slim_artist}[kind]
+    wanted = list(dict.fromkeys(key for key in ids if key))
+    missing = [key for key in wanted if key not in cache[kind]]
+    for i in range(0, len(missing), batch_size):
+        chunk = missing[i:i + batch_size]
+        for key, item in zip(chunk, fetch(chunk)[kind]):
+            # Unknown IDs come back as None, cache that too so they aren't requested every run
+            _store_metadata(cache, kind, key, slim(item) if item else None)
+
+    now = time.time()
+    metadata = {}
+    for key in wanted:
+        entry = cache[kind].get(key)
+        if entry:
+            entry['used_at'] = now
+            if entry['data'] is not None:
+                metadata[key] = entry['data']
+    return metadata
+
+def enrich_tracks(sp, cache, tracks):
+    # Fill in duration_ms and artist_ids on track dicts that lack them
+    incomplete = [track['id'] for track in tracks
+                  if track.get('duration_ms') is None or not track.get('artist_ids')]
+    metadata = get_cached_metadata(sp, cache, 'tracks', incomplete)
+    for track in tracks:
+        data = metadata.get(track['id'])
+        if data:
+            if track.get('duration_ms') is None:
+                track['duration_ms'] = data['duration_ms']
+            if not track.get('artist_ids'):
+                track['artist_ids'] = data['artist_ids']
+    return tracks
+
+def get_library_statistics(sp, cache, saved_tracks):
+    # Per-artist and per-genre listening time across the full saved library
+    tracks = [item['track'] for item in saved_tracks if item.get('track')]
+    cache_track_objects(cache, tracks)
+    artist_ids = [artist['id'] for track in tracks for artist in track['artists']]
+    artists = get_cached_metadata(sp, cache, 'artists', artist_ids)
+
+    artist_minutes = {}
+    genre_counts = {}
+    genre_minutes = {}
+    for track in tracks:
+        minutes = track['duration_ms'] / 60000
+        track_genres = set()
+        for artist in track['artists']:
+            artist_minutes[artist['name']] = artist_minutes.get(artist['name'], 0) + minutes
+            if artist['id'] in artists:
+                track_genres.update(artists[artist['id']]['genres'])
+        for genre in track_genres:
+            genre_counts[genre] = genre_counts.get(genre, 0) + 1
+            genre_minutes[genre] = genre_minutes.get(genre, 0) + minutes
+
+    return {
+        "Total Library Time (Minutes)": calculate_listening_time(tracks),
+        "Artist Time (Minutes)": sorted(artist_minutes.items(), key=lambda x: x[1], reverse=True),
+        "Genre Counts": sorted(genre_counts.items(), key=lambda x: x[1], reverse=True),
+        "Genre Time (Minutes)": sorted(genre_minutes.items(), key=lambda x: x[1], reverse=True)
+    }
+
 def calculate_listening_time(tracks):
-    total_duration_ms = sum(track['duration_ms'] for track in tracks)
+    total_duration_ms = sum(track.get('duration_ms') or 0 for track in tracks)
     total_duration_min = total_duration_ms / 60000  # Convert milliseconds to minutes
     return total_duration_min
 
-def get_streaming_statistics(sp):
+def get_streaming_statistics(sp, cache=None):
     # Get your top tracks and artists
     top_tracks = get_top_tracks(sp, limit=50, time_range='long_term')
     top_artists = get_top_artists(sp, limit=50, time_range='long_term')
 
     # Get recently played tracks
     recently_played_tracks = get_recently_played_tracks(sp, limit=50)
+    if cache is not None:
+        enrich_tracks(sp, cache, recently_played_tracks)
 
     # Calculate total listening time for recently played tracks
-    listening_time = calculate_listening_time([track['track'] for track in recently_played_tracks])
+    listening_time = calculate_listening_time(recently_played_tracks)
 
     statistics = {
         "Top Tracks": top_tracks,
@@ -124,15 +258,14 @@ def rank_tracks_by_playcount(sp):
     recently_played_tracks = get_recently_played_tracks(sp, limit=50)
     track_playcount = {}
     for item in recently_played_tracks:
-        track_id = item['track']['id']
-        track_name = item['track']['name']
+        track_id = item['id']
+        track_name = item['name']
         track_playcount[track_name] = track_playcount.get(track_name, 0) + 1
     sorted_tracks = sorted(track_playcount.items(), key=lambda x: x[1], reverse=True)
     return sorted_tracks
 
 
 if __name__ == "__main__":
-    import os
     from dotenv import load_dotenv
 
     # Load environment variables
@@ -164,9 +297,14 @@ if __name__ == "__main__":
     top_artists = get_top_artists(source_sp)
     write_data_to_file({'Top Artists': top_artists}, data_file)
 
-    # Write recently played tracks to file
-    recently_played_tracks = get_recently_played_tracks(source_sp)
+    # Missing track/artist fields are resolved through the metadata cache
+    metadata_cache = load_metadata_cache()
+
+    # Write recently played tracks and their listening time to file
+    recently_played_tracks = enrich_tracks(source_sp, metadata_cache, get_recently_played_tracks(source_sp))
     write_data_to_file({'Recently Played Tracks': recently_played_tracks}, data_file)
+    listening_time = calculate_listening_time(recently_played_tracks)
+    write_data_to_file({'Recently Played Listening Time (Minutes)': [listening_time]}, data_file)
 
     # Write followed podcasts to file
     followed_podcasts = get_followed_podcasts(source_sp)
@@ -188,5 +326,11 @@ if __name__ == "__main__":
     track_rankings = rank_tracks_by_playcount(source_sp)
     write_data_to_file({'Track Play Count Rankings': track_rankings}, data_file)
 
+    # Write full-library artist/genre statistics, resolved through the metadata cache
+    library_statistics = get_library_statistics(source_sp, metadata_cache, saved_tracks)
+    save_metadata_cache(metadata_cache)
+    write_data_to_file({key: value if isinstance(value, list) else [value]
+                        for key, value in library_statistics.items()}, data_file)
+
     print(f"\nData export completed! Check {data_file} for results.")
    
\ No newline at end of file